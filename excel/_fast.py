@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+@author: PlasticMem
+@time: 2026/10/15 10:12:36
+@function: 数值列的加速计算，安装numba时使用编译后的内核，未安装时退回numpy实现
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def collect_values(values, dtype=None):
+    """把单元格数据转换为numpy数组，空单元格转换为NaN，默认类型为float64"""
+    if np is None:
+        raise ImportError("按列计算需要安装numpy")
+    if dtype is None:
+        dtype = np.float64
+    return np.fromiter((np.nan if value is None else value for value in values), dtype=dtype)
+
+
+if numba is not None:
+    @numba.njit(cache=True, parallel=True)
+    def sum_col(column):
+        """对float64数值列求和，忽略NaN"""
+        total = 0.0
+        for i in numba.prange(column.shape[0]):
+            if not np.isnan(column[i]):
+                total += column[i]
+        return total
+else:
+    def sum_col(column):
+        """对float64数值列求和，忽略NaN"""
+        return float(np.nansum(column))
@@ -6,96 +6,400 @@
 @function:
 """
 
-import os
+import zipfile
+import posixpath
+from itertools import islice
+from functools import cached_property
+from xml.etree.ElementTree import iterparse, fromstring
 from openpyxl import load_workbook
 
+_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_PACKAGE_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_DOCUMENT_REL_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+_SHEET_TAG = _MAIN_NS + 'sheet'
+_DIMENSION_TAG = _MAIN_NS + 'dimension'
+_SHEET_DATA_TAG = _MAIN_NS + 'sheetData'
+_ROW_TAG = _MAIN_NS + 'row'
+_CELL_TAG = _MAIN_NS + 'c'
+_VALUE_TAG = _MAIN_NS + 'v'
+_STRING_ITEM_TAG = _MAIN_NS + 'si'
+_INLINE_STRING_TAG = _MAIN_NS + 'is'
+_TEXT_TAG = _MAIN_NS + 't'
+_RICH_TEXT_RUN_TAG = _MAIN_NS + 'r'
+
 
 class XlsxWorkbook:
     """读取xlsx格式的Excel文件"""
 
-    def __init__(self, filename: str = '', sheet_name: str = ''):
+    def __init__(self, filename: str = '', sheet_name: str = '', read_only: bool = True):
         self.workbook = None
         self.sheet = None
+        # 当前工作表的表头缓存，切换工作表时重置
+        self._headers = None
 
         if filename:
-            self.open_workbook(filename)
+            self.open_workbook(filename, read_only=read_only)
         if self.workbook is not None and sheet_name:
             self.select_sheet(sheet_name)
 
     @staticmethod
     def get_row_value(row: tuple):
-        """获取某一行每个单元格的数据，作为列表输出"""
+        """获取某一行每个单元格的数据，作为列表输出，行可以由单元格对象或单元格数据组成"""
         if not row:
             return None
+        if not hasattr(row[0], 'value'):
+            return list(row)
         return [cell.value for cell in row]
 
-    def open_workbook(self, filename):
-        """打开workbook"""
-        if not os.path.exists(filename):
-            raise SystemError("Excel文件不存在")
-        self.workbook = load_workbook(filename=filename)
+    def open_workbook(self, filename, read_only: bool = True, data_only: bool = True):
+        """
+        打开workbook
+        默认以只读模式打开，按行流式解析，大文件的加载速度和内存占用远优于完整加载
+        只读模式下不支持写入，且"max_row"等维度信息不可靠，需要随机访问或写入时传入read_only=False
+        """
+        try:
+            self.workbook = load_workbook(
+                filename=filename, read_only=read_only, data_only=data_only, keep_links=False
+            )
+        except FileNotFoundError as e:
+            raise SystemError("Excel文件不存在") from e
+
+    def close(self):
+        """关闭workbook，只读模式下会释放打开的文件句柄"""
+        if self.workbook is not None:
+            self.workbook.close()
 
     def select_sheet(self, sheet_name):
         """选择工作表"""
         if self.workbook is None:
             raise ValueError("尚未打开Excel文件")
         self.sheet = self.workbook[sheet_name]
+        self._headers = None
+        self.__dict__.pop('_header_to_col', None)
 
     def read_sheet_header(self):
-        """读取表头"""
+        """读取表头，首次读取后缓存"""
         if self.sheet is None:
             raise ValueError("尚未选择Sheet")
-        if self.sheet.max_row == 0:
-            return None
-        return self.get_row_value(self.sheet[1])
+        if self._headers is None:
+            for row in self.sheet.iter_rows(min_row=1, max_row=1, values_only=True):
+                self._headers = self.get_row_value(row)
+        return self._headers
+
+    @cached_property
+    def _header_to_col(self):
+        """表头名称与列下标的对应关系，重复的表头名称以第一次出现的列为准"""
+        header_to_col = {}
+        for index, header in enumerate(self.read_sheet_header() or []):
+            header_to_col.setdefault(header, index)
+        return header_to_col
+
+    def _header_width(self):
+        """
+        表头的宽度，数据行至少补齐到此宽度
+        只读模式下工作表XML缺少维度信息时openpyxl不会补齐行，需要自行补齐，保证按表头下标取值不会越界
+        """
+        return len(self.read_sheet_header() or ())
 
     def read_iter_sheet_data(self):
         """
         迭代读取每行表数据，不包含表头（即表的第一行数据）
         返回一个表数据的迭代器
-        每次迭代返回的行需要通过"get_row_value"方法获取每个单元格的数据
+        每次迭代返回的行是由单元格数据组成的元组，不再构造单元格对象，长度不小于表头的长度
+        表中没有数据时返回的迭代器为空
         """
         if self.sheet is None:
             raise ValueError("尚未选择Sheet")
-        if self.sheet.max_row < 2:
+        width = self._header_width()
+        iter_rows = self.sheet.iter_rows(min_row=2, values_only=True)
+        # 有维度信息时openpyxl已按最大列数补齐，无需再逐行检查
+        if (self.sheet.max_column or 0) >= width:
+            return iter_rows
+        return _pad_rows(iter_rows, width)
+
+    def read_batches(self, batch_size: int = 4096):
+        """
+        按批读取表数据，不包含表头（即表的第一行数据）
+        每次迭代返回一个列表，包含最多batch_size行由单元格数据组成的元组
+        适合按列批量处理数据的场景，减少逐行迭代的开销
+        """
+        return _iter_batches(self.read_iter_sheet_data(), batch_size)
+
+    def collect_column(self, header: str, dtype=None, batch_size: int = 4096):
+        """
+        根据表头名称读取整列数据（不包含表头），返回numpy数组，需要安装numpy
+        空单元格转换为NaN，默认类型为float64，列中存在无法转换的数据时抛出ValueError
+        """
+        column = self._header_to_col.get(header)
+        if column is None:
             return None
-        iter_rows = self.sheet.iter_rows()
-        next(iter_rows)
-        return iter_rows
+
+        # 按需导入，避免只读取数据时也加载numpy和numba
+        from . import _fast
+
+        values = (row[column] for batch in self.read_batches(batch_size) for row in batch)
+        return _fast.collect_values(values, dtype)
+
+    def sum_column(self, header: str):
+        """根据表头名称对数值列求和，空单元格不参与计算，安装numba时使用编译后的内核计算"""
+        column = self.collect_column(header)
+        if column is None:
+            return None
+
+        from . import _fast
+
+        return _fast.sum_col(column)
 
     def read_sheet_row(self, row_num: int):
-        """读取表的某一行数据"""
+        """
+        读取表的某一行数据
+        只读模式（默认）下每次调用都要从第一行开始顺序解析到目标行，逐行循环调用的开销随行数平方增长，
+        顺序读取请使用"read_iter_sheet_data"，需要随机访问时请以read_only=False打开workbook
+        """
         if self.sheet is None:
             raise ValueError("尚未选择Sheet")
         if row_num < 1:
             raise ValueError("行号不能小于1")
-        if row_num > self.sheet.max_row:
+        # 只读模式下max_row不可靠，只在完整加载时据此判断行号是否越界
+        if not self.workbook.read_only and row_num > self.sheet.max_row:
             return None
-        return self.get_row_value(self.sheet[row_num])
+        for row in self.sheet.iter_rows(min_row=row_num, max_row=row_num, values_only=True):
+            return self.get_row_value(_pad_row(row, self._header_width()))
+        return None
 
     def read_sheet_cell(self, row_num: int, header: str):
-        """根据行号和表头名称读取某个单元格的数据"""
-        headers = self.read_sheet_header()
-        if headers is None:
-            return None
-        if header not in headers:
+        """
+        根据行号和表头名称读取某个单元格的数据
+        与"read_sheet_row"相同，只读模式（默认）下每次调用都要从第一行开始解析，需要随机访问时请以read_only=False打开workbook
+        """
+        column = self._header_to_col.get(header)
+        if column is None:
             return None
 
         row = self.read_sheet_row(row_num)
         if row is None:
             return None
 
-        return row[headers.index(header)]
+        if column >= len(row):
+            return None
+
+        return row[column]
 
     def get_row_cell_value(self, row: tuple, header: str):
         """根据表头名称获取某一行对应的单元格的数据"""
         if not row:
             return None
 
-        headers = self.read_sheet_header()
-        if headers is None:
+        column = self._header_to_col.get(header)
+        if column is None:
             return None
-        if header not in headers:
+
+        if column >= len(row):
             return None
 
-        return row[headers.index(header)].value
+        cell = row[column]
+        return cell.value if hasattr(cell, 'value') else cell
+
+
+class XlsxFastReader:
+    """
+    流式读取xlsx格式的Excel文件，适合百万行级别的大文件
+    直接解析xlsx压缩包中的工作表XML，不经过openpyxl的对象模型，只提供按行顺序读取的接口
+    单元格数据按存储的原始类型返回：数字返回int或float，日期不做转换，公式返回缓存的计算结果
+    """
+
+    def __init__(self, filename: str = '', sheet_name: str = ''):
+        self._archive = None
+        self._sheet_paths = {}
+        self._shared_strings = []
+        self._sheet_path = None
+        self._headers = None
+
+        if filename:
+            self.open_workbook(filename)
+        if self._archive is not None and sheet_name:
+            self.select_sheet(sheet_name)
+
+    def open_workbook(self, filename):
+        """打开workbook，读取工作表列表和共享字符串表"""
+        try:
+            self._archive = zipfile.ZipFile(filename)
+        except FileNotFoundError as e:
+            raise SystemError("Excel文件不存在") from e
+        self._sheet_paths = self._load_sheet_paths()
+        self._shared_strings = self._load_shared_strings()
+
+    def close(self):
+        """关闭workbook，释放打开的文件句柄"""
+        if self._archive is not None:
+            self._archive.close()
+
+    def select_sheet(self, sheet_name):
+        """选择工作表"""
+        if self._archive is None:
+            raise ValueError("尚未打开Excel文件")
+        if sheet_name not in self._sheet_paths:
+            raise KeyError(f"工作表{sheet_name}不存在")
+        self._sheet_path = self._sheet_paths[sheet_name]
+        self._headers = None
+
+    def read_sheet_header(self):
+        """读取表头，首次读取后缓存"""
+        if self._sheet_path is None:
+            raise ValueError("尚未选择Sheet")
+        if self._headers is None:
+            for row in self._iter_rows():
+                self._headers = list(row)
+                break
+        return self._headers
+
+    def read_iter_sheet_data(self):
+        """
+        迭代读取每行表数据，不包含表头（即表的第一行数据）
+        返回一个表数据的迭代器，每次迭代返回的行是由单元格数据组成的元组
+        行的长度不小于表头、工作表维度信息记录的列数以及此前读到的最宽行中的最大者
+        表中没有数据时返回的迭代器为空
+        """
+        headers = self.read_sheet_header()
+        iter_rows = self._iter_rows(len(headers) if headers else 0)
+        next(iter_rows, None)
+        return iter_rows
+
+    def read_batches(self, batch_size: int = 4096):
+        """
+        按批读取表数据，不包含表头（即表的第一行数据）
+        每次迭代返回一个列表，包含最多batch_size行由单元格数据组成的元组
+        """
+        return _iter_batches(self.read_iter_sheet_data(), batch_size)
+
+    def _load_sheet_paths(self):
+        """读取工作表名称与工作表XML文件路径的对应关系"""
+        relationships = fromstring(self._archive.read('xl/_rels/workbook.xml.rels'))
+        targets = {}
+        for relationship in relationships.iter(_PACKAGE_REL_NS + 'Relationship'):
+            target = relationship.get('Target')
+            if target.startswith('/'):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join('xl', target))
+            targets[relationship.get('Id')] = target
+
+        workbook = fromstring(self._archive.read('xl/workbook.xml'))
+        return {sheet.get('name'): targets[sheet.get(_DOCUMENT_REL_ID)] for sheet in workbook.iter(_SHEET_TAG)}
+
+    def _load_shared_strings(self):
+        """读取共享字符串表，工作表中字符串类型的单元格只保存其在此表中的下标"""
+        if 'xl/sharedStrings.xml' not in self._archive.namelist():
+            return []
+        shared_strings = []
+        with self._archive.open('xl/sharedStrings.xml') as source:
+            for _, elem in iterparse(source):
+                if elem.tag == _STRING_ITEM_TAG:
+                    shared_strings.append(self._read_text(elem))
+                    elem.clear()
+        return shared_strings
+
+    @staticmethod
+    def _read_text(elem):
+        """读取字符串元素的文本，富文本按顺序拼接各段文本，忽略注音"""
+        text = elem.findtext(_TEXT_TAG)
+        if text is not None:
+            return text
+        return ''.join(run.findtext(_TEXT_TAG, '') for run in elem.iter(_RICH_TEXT_RUN_TAG))
+
+    def _read_cell(self, cell):
+        """读取单元格的数据"""
+        cell_type = cell.get('t', 'n')
+        if cell_type == 'inlineStr':
+            inline_string = cell.find(_INLINE_STRING_TAG)
+            return None if inline_string is None else self._read_text(inline_string)
+
+        value = cell.findtext(_VALUE_TAG)
+        if not value:
+            return None
+        if cell_type == 'n':
+            if '.' in value or 'E' in value or 'e' in value:
+                return float(value)
+            return int(value)
+        if cell_type == 's':
+            return self._shared_strings[int(value)]
+        if cell_type == 'b':
+            return value == '1'
+        return value
+
+    def _iter_rows(self, width: int = 0):
+        """
+        按顺序迭代工作表的每一行，返回由单元格数据组成的元组
+        空行和缺失的单元格以None填充，每行至少填充到width列，
+        工作表有维度信息时填充到维度记录的列数，并且不窄于此前读到的最宽行
+        """
+        row_num = 0
+        with self._archive.open(self._sheet_path) as source:
+            sheet_data = None
+            for event, elem in iterparse(source, events=('start', 'end')):
+                if event == 'start':
+                    if elem.tag == _SHEET_DATA_TAG:
+                        sheet_data = elem
+                    continue
+                if elem.tag == _DIMENSION_TAG:
+                    # 维度信息形如"A1:G2010"，只有一个单元格时形如"A1"
+                    width = max(width, _column_index(elem.get('ref', 'A1').split(':')[-1]) + 1)
+                    continue
+                if elem.tag != _ROW_TAG:
+                    continue
+
+                current_row_num = int(elem.get('r', row_num + 1))
+                for _ in range(row_num + 1, current_row_num):
+                    yield (None,) * width
+                row_num = current_row_num
+
+                values = []
+                for cell in elem.iterfind(_CELL_TAG):
+                    reference = cell.get('r')
+                    if reference:
+                        column = _column_index(reference)
+                        if column > len(values):
+                            values.extend([None] * (column - len(values)))
+                    values.append(self._read_cell(cell))
+                if len(values) < width:
+                    values.extend([None] * (width - len(values)))
+                else:
+                    width = len(values)
+
+                # 已读取的行不再保留在解析树中，内存占用不随行数增长
+                sheet_data.clear()
+                yield tuple(values)
+
+
+def _pad_row(row: tuple, width: int):
+    """把短于width的行用None补齐到width列，较长的行原样返回"""
+    if len(row) < width:
+        return tuple(row) + (None,) * (width - len(row))
+    return row
+
+
+def _pad_rows(iter_rows, width: int):
+    """逐行补齐行迭代器返回的行"""
+    for row in iter_rows:
+        yield _pad_row(row, width)
+
+
+def _iter_batches(iter_rows, batch_size: int):
+    """把行迭代器按batch_size切分，每次迭代返回一个包含最多batch_size行的列表"""
+    if batch_size < 1:
+        raise ValueError("批大小不能小于1")
+    while True:
+        batch = list(islice(iter_rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _column_index(reference: str):
+    """根据单元格坐标（如"AB12"）计算从0开始的列下标"""
+    index = 0
+    for char in reference:
+        if char.isdigit():
+            break
+        index = index * 26 + ord(char) - 64
+    return index - 1
@@ -5,17 +5,68 @@ import abc
 import time
 import json
 import hmac
+import asyncio
 import hashlib
 import requests
 import aiohttp
-from datetime import datetime
+from typing import Optional, Tuple
+from functools import partial
+from requests.adapters import HTTPAdapter
 from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # 与标准库json一致，允许非字符串类型的键，并直接序列化numpy数组
+    _json_dumps = partial(orjson.dumps, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+else:
+    def _json_dumps(obj) -> bytes:
+        """未安装orjson时使用标准库json序列化，输出格式与orjson一致（紧凑、UTF-8编码的字节串）"""
+        return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode("utf-8")
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# 同步请求共用的会话，复用连接池中的长连接，避免每次请求都重新进行TCP和TLS握手
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=3))
+# 同步请求的超时时间：(连接超时, 读取超时)，单位秒
+_TIMEOUT = (3.05, 30)
+
+
+def install_uvloop():
+    """使用uvloop替换asyncio默认的事件循环，提升大量小请求并发时的吞吐量
+
+    需要在创建事件循环之前（如asyncio.run之前）调用，未安装uvloop时不做任何改动。
+
+    :return: 是否已启用uvloop
+    """
+    if uvloop is None:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
 
 class BaseApiRequestFactory(metaclass=abc.ABCMeta):
     """腾讯云API基础类
 
     基于腾讯云API开发，定义所有API请求的公用配置代码。
+    子类在__init__中设置好_service、_host、_action、_version等变量后，需要在最后调用self._finalize()，
+    未调用时发送请求会抛出ValueError。例如：
+
+        class DescribeInstancesRequestFactory(BaseApiRequestFactory):
+            def __init__(self, secret_id: str, secret_key: str, region: str):
+                super().__init__(secret_id, secret_key, region)
+                self._service = 'cvm'
+                self._host = 'cvm.tencentcloudapi.com'
+                self._action = 'DescribeInstances'
+                self._version = '2017-03-12'
+                self._finalize()
 
     Attribute:
         _secret_id: 密钥ID
@@ -48,6 +99,17 @@ class BaseApiRequestFactory(metaclass=abc.ABCMeta):
             拼接规则：
                 1. 头部 key 统一转成小写；
                 2. 多个头部 key（小写）按照 ASCII 升序进行拼接，并且以分号（;）分隔。
+        _serializer:
+            请求参数序列化函数，接收请求参数，返回UTF-8编码的请求体字节串，
+            默认优先使用orjson，子类可替换为针对自身请求参数结构的序列化函数。
+        _timestamp_cache: 时间戳缓存，格式为(时间戳, 时间戳字符串, UTC日期)，同一秒内的请求不再重复格式化
+        _signing_cache:
+            派生签名密钥缓存，格式为((UTC日期, 服务名称, 密钥Key), SecretSigning)，
+            同一天内服务和密钥不变时复用同一个派生密钥
+        _session:
+            协程请求共用的aiohttp会话，首次发送协程请求时创建，只能在创建它的事件循环中复用。
+            在同一个事件循环中发送多个请求时，请使用 async with factory 或在结束前 await factory.close()；
+            会话不会自动关闭，事件循环结束前未关闭的会话会被丢弃，不同事件循环之间无法复用连接。
     """
     def __init__(self, secret_id: str, secret_key: str, region: str):
         self._secret_id = secret_id
@@ -67,89 +129,147 @@ class BaseApiRequestFactory(metaclass=abc.ABCMeta):
         self._action = ''
         self._version = ''
         self._content_type = 'application/json'
+        self._serializer = _json_dumps
+
+        # 由_finalize根据上面的变量计算的固定值，为None表示子类尚未调用_finalize
+        self._endpoint: Optional[str] = None
+        self._canonical_headers: Optional[str] = None
+        self._canonical_prefix: Optional[str] = None
+        self._credential_scope_tail: Optional[str] = None
+        self._base_headers: Optional[dict] = None
+
+        self._timestamp_cache: Optional[Tuple[int, str, str]] = None
+        self._signing_cache: Optional[Tuple[Tuple[str, str, str], bytes]] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def __aenter__(self):
+        return self
 
-    @property
-    def _canonical_headers(self):
-        return f"content-type:{self._content_type}\nhost:{self._host}\n"
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
 
-    @property
-    def _endpoint(self):
-        return f"https://{self._host}"
+    def _finalize(self):
+        """根据子类设置的变量预先计算每次请求都会用到的固定值
+
+        子类在__init__的最后调用，之后修改_host、_service等变量需要重新调用，
+        重新调用时会同时清空依赖这些变量的派生签名密钥缓存。
+        """
+        self._signing_cache = None
+        self._endpoint = f"https://{self._host}"
+        self._canonical_headers = f"content-type:{self._content_type}\nhost:{self._host}\n"
+        # 规范请求串中除请求体摘要外的固定部分
+        self._canonical_prefix = "\n".join([
+            self._http_request_method,
+            self._canonical_uri,
+            self._canonical_query_string,
+            self._canonical_headers,
+            self._signed_headers
+        ]) + "\n"
+        self._credential_scope_tail = f"/{self._service}/tc3_request"
+        # 与请求参数无关的请求头
+        self._base_headers = {
+            'Content-Type': self._content_type,
+            'Host': self._host,
+            'X-TC-Action': self._action,
+            'X-TC-Version': self._version,
+            'X-TC-Region': self._region,
+            'X-TC-Language': 'zh-CN'
+        }
 
     @staticmethod
     def __sign(key, msg):
         """计算签名摘要函数
 
+        使用hmac.digest单次计算，由OpenSSL直接完成HMAC-SHA256，不再创建HMAC对象
+
         :param key: 签名key
         :param msg: 签名内容
-        :return: 签名结果
+        :return: 签名结果字节串
         """
-        return hmac.new(key, msg.encode("utf-8"), hashlib.sha256)
+        return hmac.digest(key, msg.encode("utf-8"), "sha256")
 
-    def __generate_authorization(self, timestamp: int, payload: str):
+    def __generate_authorization(self, timestamp: str, now_date: str, payload_hash: str):
         """计算Authorization
 
-        :param timestamp: 时间戳
-        :param payload: 请求参数字符串
+        :param timestamp: 时间戳字符串
+        :param now_date: 时间戳对应的UTC日期，格式为YYYY-MM-DD
+        :param payload_hash: 请求体的SHA256十六进制摘要
         :return: Authorization字符串
         """
         # 拼接规范请求串
-        canonical_request = (
-                self._http_request_method + "\n"
-                + self._canonical_uri + "\n"
-                + self._canonical_query_string + "\n"
-                + self._canonical_headers + "\n"
-                + self._signed_headers + "\n"
-                + hashlib.sha256(payload.encode("utf-8")).hexdigest()
-        )
+        canonical_request = self._canonical_prefix + payload_hash
 
         # 拼接待签名字符串
-        now_date = datetime.utcfromtimestamp(timestamp).strftime("%Y-%m-%d")
-        credential_scope = now_date + "/" + self._service + "/" + "tc3_request"
+        credential_scope = now_date + self._credential_scope_tail
         hashed_canonical_request = hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
         signature_content = (
                 self._algorithm + "\n"
-                + str(timestamp) + "\n"
+                + timestamp + "\n"
                 + credential_scope + "\n"
                 + hashed_canonical_request
         )
 
-        # 计算签名
-        secret_date = self.__sign(("TC3" + self._secret_key).encode("utf-8"), now_date).digest()
-        secret_service = self.__sign(secret_date, self._service).digest()
-        secret_signing = self.__sign(secret_service, "tc3_request").digest()
-        signature = self.__sign(secret_signing, signature_content).hexdigest()
+        # 计算签名，派生密钥只与密钥、服务和UTC日期有关，三者都不变时直接复用
+        signing_key = (now_date, self._service, self._secret_key)
+        if self._signing_cache is not None and self._signing_cache[0] == signing_key:
+            secret_signing = self._signing_cache[1]
+        else:
+            secret_date = self.__sign(("TC3" + self._secret_key).encode("utf-8"), now_date)
+            secret_service = self.__sign(secret_date, self._service)
+            secret_signing = self.__sign(secret_service, "tc3_request")
+            self._signing_cache = (signing_key, secret_signing)
+        signature = self.__sign(secret_signing, signature_content).hex()
 
         return (
             f"{self._algorithm} Credential={self._secret_id}/{credential_scope}, "
             + f"SignedHeaders={self._signed_headers}, Signature={signature}"
         )
 
-    def __make_headers(self, payload: dict):
+    def __make_timestamp(self):
+        """获取当前时间戳字符串及对应的UTC日期，同一秒内直接返回缓存结果
+
+        :return: (时间戳字符串, UTC日期)
+        """
         timestamp = int(time.time())
+        if self._timestamp_cache is None or self._timestamp_cache[0] != timestamp:
+            utc = time.gmtime(timestamp)
+            now_date = "%04d-%02d-%02d" % (utc.tm_year, utc.tm_mon, utc.tm_mday)
+            self._timestamp_cache = (timestamp, str(timestamp), now_date)
+        return self._timestamp_cache[1], self._timestamp_cache[2]
+
+    def __make_headers(self, payload_hash: str):
+        timestamp, now_date = self.__make_timestamp()
         return {
-            'Authorization': self.__generate_authorization(timestamp, json.dumps(payload)),
-            'Content-Type': self._content_type,
-            'Host': self._host,
-            'X-TC-Action': self._action,
-            'X-TC-Timestamp': str(timestamp),
-            'X-TC-Version': self._version,
-            'X-TC-Region': self._region,
-            'X-TC-Language': 'zh-CN'
+            **self._base_headers,
+            'Authorization': self.__generate_authorization(timestamp, now_date, payload_hash),
+            'X-TC-Timestamp': timestamp
         }
 
+    def __prepare_request(self, payload: dict):
+        """序列化请求参数并生成请求头
+
+        请求参数只序列化一次，签名和发送使用同一份字节串，
+        Content-Type已在请求头中指定，发送时不再由HTTP库重复序列化。
+
+        :param payload: 请求参数字典
+        :return: (请求头, 请求体)
+        """
+        if self._base_headers is None:
+            raise ValueError("子类需要在__init__最后调用_finalize()")
+        payload_bytes = self._serializer(payload)
+        headers = self.__make_headers(hashlib.sha256(payload_bytes).hexdigest())
+        body = payload_bytes if self._content_type == 'application/json' else payload
+        return headers, body
+
     def send_request(self, payload: dict):
         """发送API请求
 
         :param payload: 请求参数字典
         :return: API响应数据
         """
-        headers = self.__make_headers(payload)
-
-        if self._content_type == 'application/json':
-            response = requests.post(self._endpoint, headers=headers, json=payload)
-        else:
-            response = requests.post(self._endpoint, headers=headers, data=payload)
+        headers, body = self.__prepare_request(payload)
+        response = _SESSION.post(self._endpoint, headers=headers, data=body, timeout=_TIMEOUT)
 
         data = response.json().get('Response')
         if data.get('Error'):
@@ -165,15 +285,11 @@ class BaseApiRequestFactory(metaclass=abc.ABCMeta):
         :param payload: 请求参数字典
         :return: API响应数据
         """
-        headers = self.__make_headers(payload)
+        headers, body = self.__prepare_request(payload)
 
-        async with aiohttp.ClientSession() as session:
-            if self._content_type == 'application/json':
-                async with session.post(self._endpoint, headers=headers, json=payload) as response:
-                    data = await response.json()
-            else:
-                async with session.post(self._endpoint, headers=headers, data=payload) as response:
-                    data = await response.json()
+        session = await self._get_session()
+        async with session.post(self._endpoint, headers=headers, data=body) as response:
+            data = await response.json()
 
         data = data.get('Response')
         if data.get('Error'):
@@ -182,3 +298,44 @@ class BaseApiRequestFactory(metaclass=abc.ABCMeta):
             request_id = data["RequestId"]
             raise TencentCloudSDKException(code, message, request_id)
         return data
+
+    async def _get_session(self):
+        """获取协程请求共用的会话，会话不存在、已关闭或不属于当前事件循环时重新创建
+
+        :return: aiohttp会话对象
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is not None and (self._session.closed or self._session_loop is not loop):
+            self._drop_session()
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                force_close=False,
+                enable_cleanup_closed=True,
+                keepalive_timeout=60,
+                limit=200,
+                limit_per_host=64,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._session_loop = loop
+        return self._session
+
+    def _drop_session(self):
+        """丢弃不属于当前事件循环的旧会话
+
+        会话只能在创建它的事件循环中关闭，无法在当前事件循环中关闭，只解除引用。
+        """
+        self._session = None
+        self._session_loop = None
+
+    async def close(self):
+        """关闭协程请求共用的会话，需要在创建会话的事件循环中调用"""
+        if self._session is None:
+            return
+        if self._session_loop is not asyncio.get_running_loop():
+            self._drop_session()
+            return
+
+        session = self._session
+        self._drop_session()
+        await session.close()
@@ -37,8 +37,16 @@ class BaseSdkClientFactory(metaclass=abc.ABCMeta):
         self._region = region
 
         self._cred = credential.Credential(self._secret_id, self._secret_key)
-        self._http_profile = HttpProfile()
-        self._client_profile = ClientProfile()
+        self._http_profile, self._client_profile = self._build_profiles()
+
+    def _build_profiles(self):
+        """构造HTTP配置对象和API客户端配置对象
+
+        配置固定不变的子类可以重载此方法，直接返回预先构造好的配置对象，避免每次实例化都重新构造。
+
+        :return: (HTTP配置对象, API客户端配置对象)
+        """
+        return HttpProfile(), ClientProfile()
 
     @abc.abstractmethod
     def create_client(self):
@@ -3,16 +3,28 @@
 
 from .base import BaseSdkClientFactory
 from tencentcloud.cvm.v20170312 import cvm_client
+from tencentcloud.common.profile.client_profile import ClientProfile
+from tencentcloud.common.profile.http_profile import HttpProfile
+
+# CVM客户端的配置固定不变，模块加载时构造一次，所有工厂实例共用
+_HTTP_PROFILE = HttpProfile()
+_HTTP_PROFILE.endpoint = 'cvm.tencentcloudapi.com'
+_CLIENT_PROFILE = ClientProfile()
+_CLIENT_PROFILE.httpProfile = _HTTP_PROFILE
 
 
 class CVMSdkClientFactory(BaseSdkClientFactory):
     """CVM（云服务器） API客户端工厂类
+
+    所有实例共用同一份配置对象，请勿修改实例的_http_profile和_client_profile。
     """
 
-    def __init__(self, secret_id: str, secret_key: str, region: str):
-        super().__init__(secret_id, secret_key, region)
-        self._http_profile.endpoint = 'cvm.tencentcloudapi.com'
-        self._client_profile.httpProfile = self._http_profile
+    def _build_profiles(self):
+        """返回共用的CVM配置对象
+
+        :return: (HTTP配置对象, API客户端配置对象)
+        """
+        return _HTTP_PROFILE, _CLIENT_PROFILE
 
     def create_client(self):
         """构造CVM API客户端